@@ -8,6 +8,12 @@ Usage:
   dovado.py --version
   dovado.py [-v|-vv] [options] (state | info | services | traffic | help)
   dovado.py [-v|-vv] [options] sms <number> <message>
+  dovado.py [-v|-vv] [options] daemon
+
+Commands are forwarded to a running daemon listening on the unix socket
+given by DOVADO_SOCK (default .dovado.sock in XDG_RUNTIME_DIR or home),
+if there is one owned by the current user and no connection options are
+given.
 
 Options:
   -u <username>, --username=<username> Dovado router username
@@ -22,30 +28,58 @@ Options:
 
 import logging
 from datetime import timedelta
-from contextlib import contextmanager, closing
+import threading
+import signal
+import socket
+import sys
+from functools import lru_cache
+from string import ascii_lowercase, ascii_uppercase
+from sys import argv
+from os.path import dirname, expanduser, getmtime, join
+from os import chmod, environ, remove, stat
 try:
-    import curses.ascii
-    ETB = chr(curses.ascii.ETB)
+    from os import getuid
 except ImportError:
-    import unicodedata
-    ETB = unicodedata.lookup('ETB')
-import telnetlib
-import json
-from sys import argv
-from os.path import dirname, expanduser, join
-from os import environ
+    # no unix sockets to forward over, see _DaemonClient
+    getuid = None
+from time import monotonic
+
 
 __version__ = '0.4.1'
 
 TIMEOUT = timedelta(seconds=5)
+_TIMEOUT_S = TIMEOUT.total_seconds()
+_KEEPALIVE_S = _TIMEOUT_S / 2
+_PING_TIMEOUT_S = 0.5
 
 _LOGGER = logging.getLogger(__name__)
 
 DEFAULT_PORT = 6435
 
+DEFAULT_CACHE_TTL = 2.0
+
+
+_TCP_QUICKACK = getattr(socket, 'TCP_QUICKACK', None)
+
+# large enough for the biggest responses, like help and traffic
+_STREAM_LIMIT = 2 ** 20
 
+_CURSOR = b'>> '
+_SMS_END = b'\n.\n'
+ETB = '\x17'
+_ETB = b'\x17'
+
+_INT_PREFIXES = ('traffic modem', 'sms ')
+
+# lower case keys and replace underscores with spaces in one pass
+_KEY_TABLE = str.maketrans('_' + ascii_uppercase, ' ' + ascii_lowercase)
+
+
+@lru_cache(maxsize=1)
 def _get_gw():
     """Determine ip of gateway."""
+    if 'DOVADO_GATEWAY' in environ:
+        return environ['DOVADO_GATEWAY']
     try:
         import netifaces
     except ImportError:
@@ -57,120 +91,697 @@ def _get_gw():
     return gateway
 
 
+def _expect(condition, reason):
+    """Raise if condition not met."""
+    if not condition:
+        raise RuntimeError(reason)
+
+
 def _log(what, msg):
     """Helper method for logging."""
+    if not _LOGGER.isEnabledFor(logging.DEBUG):
+        return
+    if isinstance(msg, bytes):
+        msg = msg.decode('ascii', 'replace')
     if msg.strip():
         _LOGGER.debug('%s %s', what, msg.strip().replace('\n', '\\n'))
 
 
-class Dovado():
-    """Representing a Dovado router."""
+def _parse_response(res):
+    """Convert query response into dict."""
+    ret = {}
+    for line in res.splitlines():
+        key, sep, value = line.partition('=')
+        if not sep:
+            key, _, value = key.partition(':')
+        key = key.translate(_KEY_TABLE)
+        if key.startswith(_INT_PREFIXES):
+            value = int(value)
+        ret[key] = value
+    return ret
+
+
+class _TelnetLite():
+    """Blocking connection to router, without telnet option negotiation."""
+
+    def __init__(self, hostname, port, timeout=_TIMEOUT_S):
+        self._timeout = timeout
+        self._sock = socket.create_connection((hostname, port),
+                                              timeout=timeout)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._quickack()
+        self._buffer = bytearray()
+
+    def _quickack(self):
+        """Ask for responses to be acked immediately, where supported."""
+        # not sticky on linux, so it has to be rearmed after each read
+        if _TCP_QUICKACK:
+            self._sock.setsockopt(socket.IPPROTO_TCP, _TCP_QUICKACK, 1)
+
+    def read_until(self, what, timeout=None):
+        """Read up to and including what, only scanning new data."""
+        if timeout is not None:
+            self._sock.settimeout(timeout)
+        try:
+            buf = self._buffer
+            pos = buf.find(what)
+            while pos < 0:
+                start = max(0, len(buf) - len(what) + 1)
+                chunk = self._sock.recv(4096)
+                if not chunk:
+                    raise EOFError('Connection closed by router')
+                self._quickack()
+                buf += chunk
+                pos = buf.find(what, start)
+        finally:
+            if timeout is not None:
+                self._sock.settimeout(self._timeout)
+        end = pos + len(what)
+        ret = bytes(buf[:end])
+        del buf[:end]
+        return ret
+
+    def write(self, data):
+        """Write data to connection."""
+        self._sock.sendall(data)
+
+    def close(self):
+        """Close connection."""
+        self._sock.close()
+
 
-    def __init__(self, username, password, hostname=None, port=None):
+class _Router():  # pylint: disable=too-few-public-methods
+    """Connection parameters of a Dovado router."""
+
+    def __init__(  # pylint: disable=too-many-arguments
+            self, username, password, hostname=None, port=None, *,
+            cache_ttl=DEFAULT_CACHE_TTL, keepalive=False):
         self._username = username
         self._password = password
         self._hostname = hostname or _get_gw()
-        self._port = int(port or DEFAULT_PORT)
+        if port is None:
+            port = DEFAULT_PORT
+        elif not isinstance(port, int):
+            port = int(port)
+        self._port = port
+        self._cache_ttl = cache_ttl
+        self._keepalive = keepalive
+        self.invalidate()
+
+    def invalidate(self):
+        """Forget cached state, so it is fetched again on next access."""
+        self._last = (0.0, None)
+
+    def _cached_state(self):
+        """Return state fetched less than cache_ttl seconds ago, if any."""
+        timestamp, state = self._last
+        if state is not None and monotonic() - timestamp < self._cache_ttl:
+            return dict(state)
+        return None
+
+    def _cache_state(self, state):
+        """Remember state for later calls."""
+        if self._cache_ttl:
+            self._last = (monotonic(), state)
+        return dict(state)
+
+    def _log_failure(self, error):
+        """Log failure to communicate with router."""
+        _LOGGER.warning('Could not communicate with %s@%s:%d: %s',
+                        self._username, self._hostname, self._port, error)
+
+
+class Dovado(_Router):
+    """Representing a Dovado router."""
+
+    def __init__(  # pylint: disable=too-many-arguments
+            self, username, password, hostname=None, port=None, *,
+            cache_ttl=DEFAULT_CACHE_TTL, keepalive=False):
+        super().__init__(username, password, hostname, port,
+                         cache_ttl=cache_ttl, keepalive=keepalive)
         self._connection = None
+        self._at_cursor = False
+        self._lock = threading.Lock()
+        self._keepalive_timer = None
 
     def _until(self, what):
         """Wait for response."""
-        what = what.encode('utf-8')
-        ret = self._connection.read_until(what, timeout=TIMEOUT.seconds)
-        return ret.decode('ascii')
+        return self._connection.read_until(what)
 
     def _write(self, what):
         """Write data to connection."""
         _log('send', what)
-        self._connection.write(what.encode('utf-8'))
+        self._connection.write(what.encode('ascii', 'replace'))
 
     def _send(self, *cmd):
         """Send command to router."""
-        cmd = ' '.join(cmd)
-        cursor = '>> '
-        ret = self._until('\n')
-        _log('(skipping)', ret)
-        ret = self._until(cursor)
-        self._write(cmd + '\n')
-        ret = self._until(ETB)[:-1]
-        _log('recv', ret)
-        return ret
+        return self._send_many(' '.join(cmd))[0]
+
+    def _send_many(self, *cmds):
+        """Send several commands at once and collect the responses."""
+        self._write(''.join(cmd + '\n' for cmd in cmds))
+        responses = []
+        for _ in cmds:
+            if self._at_cursor:
+                self._at_cursor = False
+            else:
+                _log('(skipping)', self._until(_CURSOR))
+            ret = self._until(_ETB)[:-1].decode('ascii', 'replace')
+            _log('recv', ret)
+            responses.append(ret)
+        return responses
 
     def _parse_query(self, cmd):
         """Make query and convert response into dict."""
-        res = self._send(cmd)
-        res = [item.split('=')
-               for item in res.splitlines()]
-        res = [item[0].split(':')
-               if len(item) == 1
-               else item
-               for item in res]
-        res = [(k.lower().replace('_', ' '), v)
-               for k, v in res]
-        res = [(k, int(v))
-               if k.startswith('traffic modem') or k.startswith('sms ')
-               else (k, v)
-               for k, v in res]
-        res = dict(res)
-        return res
-
-    @contextmanager
-    def _connect(self, hostname, port):
-        """Open connection to router."""
-        self._connection = telnetlib.Telnet(hostname, port,
-                                            timeout=TIMEOUT.seconds)
-        with closing(self._connection):
-            yield
-
-    @contextmanager
-    def session(self):
-        """Open connection to router."""
+        return _parse_response(self._send(cmd))
+
+    def _connect(self):
+        """Open connection to router and log in."""
         _LOGGER.info('Connecting to %s@%s:%d',
                      self._username, self._hostname, self._port)
-
-        def _expect(condition, reason):
-            if not condition:
-                raise RuntimeError(reason)
-
+        self._connection = _TelnetLite(self._hostname, self._port)
         try:
-            with self._connect(self._hostname,
-                               self._port):
-                _LOGGER.debug('Connected, logging in as user %s',
-                              self._username)
-                ret = self._send('user', self._username)
-                _expect('Hello' in ret, 'User unknown')
-                ret = self._send('pass', self._password)
-                _expect('Access granted' in ret, 'Could not authenticate')
-                yield
-                self._send('quit')
-        except (RuntimeError, OSError, IOError, EOFError) as error:
-            _LOGGER.warning('Could not communicate with %s@%s:%d: %s',
-                            self._username, self._hostname, self._port, error)
+            _LOGGER.debug('Connected, logging in as user %s',
+                          self._username)
+            ret = self._send('user', self._username)
+            _expect('Hello' in ret, 'User unknown')
+            ret = self._send('pass', self._password)
+            _expect('Access granted' in ret, 'Could not authenticate')
+        except (RuntimeError, OSError, IOError, EOFError):
+            self._disconnect()
             raise
+        if self._keepalive:
+            self._schedule_keepalive()
+
+    def _disconnect(self):
+        """Drop connection to router."""
+        if self._keepalive_timer:
+            self._keepalive_timer.cancel()
+            self._keepalive_timer = None
+        if self._connection:
+            self._connection.close()
+            self._connection = None
+            self._at_cursor = False
+
+    def _schedule_keepalive(self):
+        """Ping router in a while."""
+        self._keepalive_timer = threading.Timer(_KEEPALIVE_S,
+                                                self._keep_alive)
+        self._keepalive_timer.daemon = True
+        self._keepalive_timer.start()
+
+    def _keep_alive(self):
+        """Ping router to keep connection open."""
+        with self._lock:
+            if threading.current_thread() is not self._keepalive_timer:
+                return  # superseded by a reconnect or close
+            if self._ping():
+                self._schedule_keepalive()
+
+    def _ping(self):
+        """Check connection, with the lock held."""
+        if self._connection is None:
+            return False
+        try:
+            if not self._at_cursor:
+                # the cursor following the last response is still unread
+                self._until(_CURSOR)
+            self._write('\n')
+            self._at_cursor = False
+            self._connection.read_until(_CURSOR, _PING_TIMEOUT_S)
+            self._at_cursor = True
+            return True
+        except (OSError, IOError, EOFError) as error:
+            _LOGGER.info('Connection lost: %s', error)
+            self._disconnect()
+            return False
+
+    def ping(self):
+        """Check that connection to router is still alive."""
+        with self._lock:
+            return self._ping()
+
+    def _acquire(self):
+        """Return logged in connection, reconnecting if needed."""
+        if self._connection is None:
+            self._connect()
+        return self._connection
+
+    def _transaction(self, func, *args):
+        """Run func on the pooled connection, retrying once if it dropped."""
+        with self._lock:
+            try:
+                try:
+                    self._acquire()
+                    return func(*args)
+                except (OSError, IOError, EOFError) as error:
+                    _LOGGER.info('Connection lost, reconnecting: %s', error)
+                    self._disconnect()
+                    self._acquire()
+                    return func(*args)
+            except (RuntimeError, OSError, IOError, EOFError) as error:
+                self._disconnect()
+                self._log_failure(error)
+                raise
+
+    def __enter__(self):
+        """Use as context manager, closing connection on exit."""
+        return self
+
+    def __exit__(self, *exc_info):
+        """Close connection."""
+        self.close()
+
+    def close(self):
+        """Log out and close connection to router."""
+        with self._lock:
+            if self._connection is None:
+                return
+            try:
+                self._send('quit')
+            except (OSError, IOError, EOFError):
+                pass
+            finally:
+                self._disconnect()
+
+    def _send_sms(self, number, message):
+        """Send SMS on current connection."""
+        res = self._send('sms sendtxt %s' % number)
+        if 'Start sms input' in res:
+            _log('send', message)
+            self._connection.write(
+                b''.join([message.encode('utf-8'), _SMS_END]))
 
     def send_sms(self, number, message):
         """Send SMS through the router."""
-        with self.session():
-            res = self._send('sms sendtxt %s' % number)
-            if 'Start sms input' in res:
-                self._write('%s\n.\n' % message)
+        self.invalidate()
+        self._transaction(self._send_sms, number, message)
 
     def query(self, command, parse_response=True):
         """Send query to server."""
-        with self.session():
-            if parse_response:
-                return self._parse_query(command)
-            return self._send(command)
+        self.invalidate()
+        if parse_response:
+            return self._transaction(self._parse_query, command)
+        return self._transaction(self._send, command)
+
+    def _state(self):
+        """Query state on current connection."""
+        _LOGGER.debug('Querying state')
+        # pylint: disable=unbalanced-tuple-unpacking
+        info, services = self._send_many('info', 'services')
+        info = _parse_response(info)
+        info.update(_parse_response(services))
+        return info
 
     @property
     def state(self):
         """Update state from router."""
-        with self.session():
-            _LOGGER.debug('Querying state')
-            info = self._parse_query('info')
-            services = self._parse_query('services')
-            info.update(services)
-            return info
+        state = self._cached_state()
+        if state is None:
+            state = self._cache_state(self._transaction(self._state))
+        return state
+
+
+def _async_errors():
+    """Return exceptions telling that an asyncio connection is unusable."""
+    import asyncio  # pylint: disable=import-outside-toplevel
+    return (OSError, IOError, EOFError,
+            asyncio.TimeoutError, asyncio.LimitOverrunError)
+
+
+class AsyncDovado(_Router):
+    """Representing a Dovado router, communicating through asyncio."""
+
+    def __init__(  # pylint: disable=too-many-arguments
+            self, username, password, hostname=None, port=None, *,
+            cache_ttl=DEFAULT_CACHE_TTL, keepalive=False):
+        """Set up router, connecting on first request."""
+        super().__init__(username, password, hostname, port,
+                         cache_ttl=cache_ttl, keepalive=keepalive)
+        self._reader = None
+        self._writer = None
+        self._loop = None
+        self._at_cursor = False
+        self._lock = None
+        self._lock_loop = None
+        self._keepalive_task = None
+
+    def _get_lock(self):
+        """Return lock for the running event loop."""
+        import asyncio  # pylint: disable=import-outside-toplevel
+        # before python 3.10 a lock binds to the loop current when created,
+        # so create it from within the loop, once per loop in use
+        loop = asyncio.get_running_loop()
+        if self._lock_loop is not loop:
+            self._lock = asyncio.Lock()
+            self._lock_loop = loop
+        return self._lock
+
+    async def _until(self, what):
+        """Wait for response."""
+        import asyncio  # pylint: disable=import-outside-toplevel
+        return await asyncio.wait_for(self._reader.readuntil(what),
+                                      timeout=_TIMEOUT_S)
+
+    def _write(self, what):
+        """Write data to connection."""
+        _log('send', what)
+        self._writer.write(what.encode('ascii', 'replace'))
+
+    async def _send(self, *cmd):
+        """Send command to router."""
+        return (await self._send_many(' '.join(cmd)))[0]
+
+    async def _send_many(self, *cmds):
+        """Send several commands at once and collect the responses."""
+        self._write(''.join(cmd + '\n' for cmd in cmds))
+        await self._writer.drain()
+        responses = []
+        for _ in cmds:
+            if self._at_cursor:
+                self._at_cursor = False
+            else:
+                _log('(skipping)', await self._until(_CURSOR))
+            ret = (await self._until(_ETB))[:-1].decode('ascii', 'replace')
+            _log('recv', ret)
+            responses.append(ret)
+        return responses
+
+    async def _parse_query(self, cmd):
+        """Make query and convert response into dict."""
+        return _parse_response(await self._send(cmd))
+
+    async def _connect(self):
+        """Open connection to router and log in."""
+        import asyncio  # pylint: disable=import-outside-toplevel
+        _LOGGER.info('Connecting to %s@%s:%d',
+                     self._username, self._hostname, self._port)
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(self._hostname, self._port,
+                                    limit=_STREAM_LIMIT),
+            timeout=_TIMEOUT_S)
+        self._loop = asyncio.get_running_loop()
+        try:
+            _LOGGER.debug('Connected, logging in as user %s',
+                          self._username)
+            ret = await self._send('user', self._username)
+            _expect('Hello' in ret, 'User unknown')
+            ret = await self._send('pass', self._password)
+            _expect('Access granted' in ret, 'Could not authenticate')
+        except (RuntimeError,) + _async_errors():
+            self._disconnect()
+            raise
+        if self._keepalive:
+            self._keepalive_task = asyncio.ensure_future(self._keep_alive())
+
+    def _disconnect(self):
+        """Drop connection to router."""
+        import asyncio  # pylint: disable=import-outside-toplevel
+        if self._keepalive_task:
+            if self._keepalive_task is not asyncio.current_task():
+                self._keepalive_task.cancel()
+            self._keepalive_task = None
+        if self._writer:
+            self._writer.close()
+            self._forget()
+
+    def _forget(self):
+        """Drop connection to router without closing it."""
+        self._reader = self._writer = self._loop = None
+        self._keepalive_task = None
+        self._at_cursor = False
+
+    def _drop_stale(self):
+        """Drop connection opened in another event loop."""
+        import asyncio  # pylint: disable=import-outside-toplevel
+        if (self._writer is not None and
+                self._loop is not asyncio.get_running_loop()):
+            # closing it would need the old loop, which may be closed
+            _LOGGER.debug('Dropping connection of previous event loop')
+            self._forget()
+
+    async def _keep_alive(self):
+        """Ping router periodically to keep connection open."""
+        import asyncio  # pylint: disable=import-outside-toplevel
+        while True:
+            await asyncio.sleep(_KEEPALIVE_S)
+            if not await self.ping():
+                return
+
+    async def ping(self):
+        """Check that connection to router is still alive."""
+        import asyncio  # pylint: disable=import-outside-toplevel
+        async with self._get_lock():
+            self._drop_stale()
+            if self._writer is None:
+                return False
+            try:
+                if not self._at_cursor:
+                    # the cursor following the last response is still unread
+                    await self._until(_CURSOR)
+                self._write('\n')
+                self._at_cursor = False
+                await self._writer.drain()
+                await asyncio.wait_for(self._reader.readuntil(_CURSOR),
+                                       timeout=_PING_TIMEOUT_S)
+                self._at_cursor = True
+                return True
+            except _async_errors() as error:
+                _LOGGER.info('Connection lost: %s', error)
+                self._disconnect()
+                return False
+
+    async def _acquire(self):
+        """Return logged in connection, reconnecting if needed."""
+        self._drop_stale()
+        if self._writer is None:
+            await self._connect()
+        return self._reader, self._writer
+
+    async def _transaction(self, func, *args):
+        """Run func on the pooled connection, retrying once if it dropped."""
+        async with self._get_lock():
+            try:
+                try:
+                    await self._acquire()
+                    return await func(*args)
+                except _async_errors() as error:
+                    _LOGGER.info('Connection lost, reconnecting: %s', error)
+                    self._disconnect()
+                    await self._acquire()
+                    return await func(*args)
+            except (RuntimeError,) + _async_errors() as error:
+                self._disconnect()
+                self._log_failure(error)
+                raise
+
+    async def __aenter__(self):
+        """Use as context manager, closing connection on exit."""
+        return self
+
+    async def __aexit__(self, *exc_info):
+        """Close connection."""
+        await self.close()
+
+    async def close(self):
+        """Log out and close connection to router."""
+        async with self._get_lock():
+            self._drop_stale()
+            if self._writer is None:
+                return
+            try:
+                await self._send('quit')
+            except _async_errors():
+                pass
+            finally:
+                self._disconnect()
+
+    async def _send_sms(self, number, message):
+        """Send SMS on current connection."""
+        res = await self._send('sms sendtxt %s' % number)
+        if 'Start sms input' in res:
+            _log('send', message)
+            self._writer.writelines([message.encode('utf-8'), _SMS_END])
+            await self._writer.drain()
+
+    async def send_sms(self, number, message):
+        """Send SMS through the router."""
+        self.invalidate()
+        await self._transaction(self._send_sms, number, message)
+
+    async def query(self, command, parse_response=True):
+        """Send query to server."""
+        self.invalidate()
+        if parse_response:
+            return await self._transaction(self._parse_query, command)
+        return await self._transaction(self._send, command)
+
+    async def _state(self):
+        """Query state on current connection."""
+        _LOGGER.debug('Querying state')
+        info, services = await self._send_many('info', 'services')
+        info = _parse_response(info)
+        info.update(_parse_response(services))
+        return info
+
+    async def state(self):
+        """Update state from router."""
+        state = self._cached_state()
+        if state is None:
+            state = self._cache_state(await self._transaction(self._state))
+        return state
+
+
+def poll(*routers):
+    """Query state of several AsyncDovado routers concurrently."""
+    import asyncio  # pylint: disable=import-outside-toplevel
+
+    async def _poll():
+        try:
+            return await asyncio.gather(*(router.state()
+                                          for router in routers))
+        finally:
+            for router in routers:
+                await router.close()
+    return asyncio.run(_poll())
+
+
+def _serve(router, path):
+    """Serve requests from _DaemonClient through one AsyncDovado router."""
+    import asyncio  # pylint: disable=import-outside-toplevel
+    import json  # pylint: disable=import-outside-toplevel
+    methods = {
+        'state': router.state,
+        'query': router.query,
+        'send_sms': router.send_sms,
+    }
+    # ValueError from responses that could not be parsed
+    router_errors = (RuntimeError, ValueError) + _async_errors()
+
+    async def _handle(reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    call = methods[request['method']](*request['args'])
+                except (KeyError, TypeError, ValueError) as error:
+                    response = {'error': 'Invalid request: %r' % error}
+                else:
+                    try:
+                        response = {'result': await call}
+                    except router_errors as error:
+                        response = {'error': str(error)}
+                writer.write(json.dumps(response).encode('utf-8') + b'\n')
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def _serve_forever():
+        server = await asyncio.start_unix_server(_handle, path)
+        chmod(path, 0o600)
+        _LOGGER.info('Listening on %s', path)
+        loop = asyncio.get_running_loop()
+        stop = loop.create_future()
+        loop.add_signal_handler(signal.SIGTERM, stop.set_result, None)
+        try:
+            async with server:
+                await stop
+        finally:
+            await router.close()
+            remove(path)
+
+    try:
+        asyncio.run(_serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+class _DaemonClient():
+    """Forward requests to a running daemon, see _serve."""
+
+    def __init__(self, sock):
+        self._sock = sock
+        self._file = sock.makefile('rwb')
+
+    @classmethod
+    def connect(cls, path):
+        """Connect to daemon, if one is running."""
+        if getuid is None or not hasattr(socket, 'AF_UNIX'):
+            return None
+        try:
+            if stat(path).st_uid != getuid():
+                _LOGGER.warning('Not forwarding to %s, owned by other user',
+                                path)
+                return None
+        except (IOError, OSError):
+            return None
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # leave room for the daemon to reconnect and log in to the router
+        sock.settimeout(4 * _TIMEOUT_S)
+        try:
+            sock.connect(path)
+        except (IOError, OSError):
+            sock.close()
+            return None
+        _LOGGER.info('Forwarding to daemon at %s', path)
+        return cls(sock)
+
+    def _call(self, method, *args):
+        """Make request to daemon and wait for response."""
+        import json  # pylint: disable=import-outside-toplevel
+        request = json.dumps({'method': method, 'args': args})
+        self._file.write(request.encode('utf-8') + b'\n')
+        self._file.flush()
+        line = self._file.readline()
+        if not line:
+            raise EOFError('Daemon closed connection')
+        response = json.loads(line)
+        if 'error' in response:
+            raise RuntimeError(response['error'])
+        return response['result']
+
+    @property
+    def state(self):
+        """Update state from router."""
+        return self._call('state')
+
+    def query(self, command, parse_response=True):
+        """Send query to server."""
+        return self._call('query', command, parse_response)
+
+    def send_sms(self, number, message):
+        """Send SMS through the router."""
+        self._call('send_sms', number, message)
+
+    def __enter__(self):
+        """Use as context manager, closing connection on exit."""
+        return self
+
+    def __exit__(self, *exc_info):
+        """Close connection."""
+        self.close()
+
+    def close(self):
+        """Close connection to daemon."""
+        self._file.close()
+        self._sock.close()
+
+
+@lru_cache(maxsize=4)
+def _parse_credentials(path, mtime):  # pylint: disable=unused-argument
+    """Parse credentials file, cached until the file is modified."""
+    credentials = {}
+    with open(path) as config:
+        for line in config:
+            if line.startswith('#'):
+                continue
+            key, sep, value = line.rstrip('\n').partition(': ')
+            if sep:
+                credentials[key] = value
+    return credentials
 
 
 def _read_credentials():
@@ -181,19 +792,50 @@ def _read_credentials():
             (environ.get('XDG_CONFIG_HOME',
                          join(expanduser('~'), '.config')),
              'dovado.conf')]:
+        path = join(path, filename)
         try:
-            print(path, filename)
-            with open(join(path, filename)) as config:
-                return dict(x.split(': ')
-                            for x in config.read().strip().splitlines()
-                            if not x.startswith('#'))
+            return _parse_credentials(path, getmtime(path))
         except (IOError, OSError):
             continue
     return {}
 
 
+def _credentials(args):
+    """Merge credentials from file with those given on command line."""
+    credentials = dict(_read_credentials())
+    credentials.update({param: args['--'+param]
+                        for param in ['username', 'password', 'host', 'port']
+                        if args['--'+param]})
+    host = credentials.pop('host')
+    if host != 'autodetect':
+        credentials['hostname'] = host
+
+    if 'username' and 'password' not in credentials:
+        exit('Username and password expected')
+
+    return credentials
+
+
+def _socket_path():
+    """Return path of daemon socket."""
+    return environ.get('DOVADO_SOCK') or join(
+        environ.get('XDG_RUNTIME_DIR') or expanduser('~'), '.dovado.sock')
+
+
+def _connect_daemon(args):
+    """Connect to running daemon, if it can serve the command."""
+    # the daemon is connected to its own router, so do not forward
+    # commands asking for another one
+    if (args['--username'] or args['--password'] or
+            args['--host'] != 'autodetect' or
+            args['--port'] != str(DEFAULT_PORT)):
+        return None
+    return _DaemonClient.connect(_socket_path())
+
+
 def main():
     """Main method."""
+    import json  # pylint: disable=import-outside-toplevel
     import docopt  # pylint:disable=import-error
     args = docopt.docopt(__doc__,
                          version=__version__)
@@ -207,40 +849,35 @@ def main():
     fmt = '%(asctime)s %(name)s: %(message)s'
     logging.basicConfig(level=level, format=fmt, datefmt='%H:%M:%S')
 
-    credentials = _read_credentials()
-    credentials.update({param: args['--'+param]
-                        for param in ['username', 'password', 'host', 'port']
-                        if args['--'+param]})
-    if credentials['host'] == 'autodetect':
-        del credentials['host']
-
-    if 'username' and 'password' not in credentials:
-        exit('Username and password expected')
+    if args['daemon']:
+        _serve(AsyncDovado(keepalive=True, **_credentials(args)),
+               _socket_path())
+        return
 
-    dovado = Dovado(**credentials)
+    dovado = _connect_daemon(args) or Dovado(**_credentials(args))
 
     def emit(obj):
         """Print object."""
         if isinstance(obj, dict):
-            print(json.dumps(obj, indent=2))
-        else:
-            print(obj)
+            obj = json.dumps(obj, indent=2, ensure_ascii=False)
+        sys.stdout.write(obj + '\n')
 
     try:
-        if args['state']:
-            emit(dovado.state)
-        elif args['help']:
-            emit(dovado.query('help', parse_response=False))
-        elif args['info']:
-            emit(dovado.query('info'))
-        elif args['services']:
-            emit(dovado.query('services'))
-        elif args['traffic']:
-            emit(dovado.query('traffic', parse_response=False))
-        elif args['sms']:
-            dovado.send_sms(args['<number>'], args['<message>'])
+        with dovado:
+            if args['state']:
+                emit(dovado.state)
+            elif args['help']:
+                emit(dovado.query('help', parse_response=False))
+            elif args['info']:
+                emit(dovado.query('info'))
+            elif args['services']:
+                emit(dovado.query('services'))
+            elif args['traffic']:
+                emit(dovado.query('traffic', parse_response=False))
+            elif args['sms']:
+                dovado.send_sms(args['<number>'], args['<message>'])
     except (RuntimeError, OSError, IOError, EOFError) as e:
-        exit('Failed to contact router: %s' % e.message)
+        exit('Failed to contact router: %s' % e)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,413 @@
+"""Tests against a fake router."""
+import asyncio
+import json
+import os
+import signal
+import socket
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+import dovado
+
+RESPONSES = {
+    'user u': b'Hello u',
+    'pass pw': b'Access granted',
+    'info': b'PRODUCT_NAME=Dovado\nTRAFFIC_MODEM_TX=12\nSMS_UNREAD=2\n',
+    'services': b'SMS:enabled\nHOME_AUTOMATION:disabled\n',
+}
+
+
+@pytest.fixture(name='pair')
+def fixture_pair():
+    """Return connection to router and the router end of it."""
+    # a socketpair would be AF_UNIX, which does not take TCP options
+    with socket.create_server(('127.0.0.1', 0)) as listener:
+        connection = dovado._TelnetLite(  # pylint: disable=protected-access
+            *listener.getsockname())
+        peer, _ = listener.accept()
+    yield connection, peer
+    connection.close()
+    peer.close()
+
+
+def _send_slowly(peer, *chunks):
+    """Send chunks in separate segments, from another thread."""
+    def _send():
+        for chunk in chunks:
+            time.sleep(0.05)
+            peer.sendall(chunk)
+    thread = threading.Thread(target=_send, daemon=True)
+    thread.start()
+    return thread
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """Answer commands like the router, hanging up when told to."""
+
+    def handle(self):
+        server = self.server
+        server.connections += 1
+        self.wfile.write(b'Welcome\n>> ')
+        served = 0
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            cmd = line.decode().strip()
+            server.commands.append(cmd)
+            if not cmd:
+                if server.answer_ping:
+                    self.wfile.write(b'\n>> ')
+                continue
+            self.wfile.write(RESPONSES.get(cmd, b'unknown') + b'\x17\n>> ')
+            served += 1
+            if served == server.hangup_after:
+                return
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    """Fake router."""
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), _Handler)
+        self.connections = 0
+        self.commands = []
+        self.hangup_after = None
+        self.answer_ping = True
+
+    def count(self, cmd):
+        """Return number of times cmd was received."""
+        return self.commands.count(cmd)
+
+
+@pytest.fixture(name='router')
+def fixture_router():
+    """Run fake router in a thread."""
+    server = _Server()
+    thread = threading.Thread(target=server.serve_forever,
+                              kwargs={'poll_interval': 0.05}, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _dovado(router, password='pw', cls=dovado.Dovado, **kwargs):
+    """Return client for fake router."""
+    kwargs.setdefault('cache_ttl', 0)
+    return cls('u', password, '127.0.0.1', router.server_address[1],
+               **kwargs)
+
+
+def test_sentinel_split_across_chunks(pair):
+    """Sentinel is found when split over several reads."""
+    connection, peer = pair
+    _send_slowly(peer, b'abc\n', b'>', b'> rest')
+    assert connection.read_until(b'\n>> ') == b'abc\n>> '
+
+
+def test_leftover_kept_for_next_read(pair):
+    """Data following the sentinel is returned by the next read."""
+    connection, peer = pair
+    peer.sendall(b'first\x17\n>> second\x17')
+    assert connection.read_until(b'\x17') == b'first\x17'
+    assert connection.read_until(b'>> ') == b'\n>> '
+    assert connection.read_until(b'\x17') == b'second\x17'
+    peer.close()
+    with pytest.raises(EOFError):
+        connection.read_until(b'\x17')
+
+
+def test_read_timeout(pair):
+    """Waiting for a sentinel that never comes times out."""
+    connection, _ = pair
+    with pytest.raises(socket.timeout):
+        connection.read_until(b'\x17', 0.1)
+
+
+def test_pipelined_state(router):
+    """Info and services are sent together and answered in order."""
+    with _dovado(router) as client:
+        state = client.state
+    assert router.commands[:4] == ['user u', 'pass pw', 'info', 'services']
+    assert state['product name'] == 'Dovado'
+    assert state['traffic modem tx'] == 12
+    assert state['sms'] == 'enabled'
+    assert state['home automation'] == 'disabled'
+
+
+def test_reconnect_after_eof(router):
+    """Dropped connection is reopened and the query retried."""
+    router.hangup_after = 4
+    with _dovado(router) as client:
+        assert client.state['sms unread'] == 2
+        assert client.state['sms unread'] == 2
+    assert router.connections == 2
+    assert router.commands[4:8] == ['user u', 'pass pw', 'info', 'services']
+
+
+def test_authentication_failure(router):
+    """Wrong password is reported and the connection dropped."""
+    with _dovado(router, password='wrong') as client:
+        with pytest.raises(RuntimeError, match='authenticate'):
+            client.query('info')
+    assert router.count('quit') == 0
+
+
+def test_query_reuses_connection(router):
+    """Queries share one logged in connection."""
+    with _dovado(router) as client:
+        assert client.query('info')['product name'] == 'Dovado'
+        assert client.query('services', parse_response=False).startswith(
+            'SMS:')
+    assert router.connections == 1
+    assert router.count('user u') == 1
+    assert router.count('quit') == 1
+
+
+def test_state_cached(router, monkeypatch):
+    """State is fetched again once cache_ttl has passed."""
+    now = [100.0]
+    monkeypatch.setattr(dovado, 'monotonic', lambda: now[0])
+    with _dovado(router, cache_ttl=10) as client:
+        client.state['sms'] = 'changed by caller'
+        assert client.state['sms'] == 'enabled'
+        assert router.count('info') == 1
+        now[0] += 10
+        assert client.state
+        assert router.count('info') == 2
+
+
+def test_state_invalidated(router):
+    """Invalidating or querying fetches state again."""
+    with _dovado(router, cache_ttl=60) as client:
+        assert client.state
+        client.invalidate()
+        assert client.state
+        client.query('info')
+        assert client.state
+    assert router.count('services') == 3
+
+
+def test_state_not_cached(router):
+    """State is fetched every time without cache_ttl."""
+    with _dovado(router) as client:
+        assert client.state
+        assert client.state
+    assert router.count('info') == 2
+
+
+def test_ping(router):
+    """Ping waits for the router and keeps the cursor in step."""
+    with _dovado(router) as client:
+        assert not client.ping()
+        assert client.state
+        assert client.ping()
+        assert client.ping()
+        assert client.state['sms'] == 'enabled'
+        assert client.ping()
+    assert router.count('') == 3
+    assert router.connections == 1
+
+
+def test_ping_unanswered(router):
+    """Ping fails if the router does not answer, dropping the connection."""
+    router.answer_ping = False
+    with _dovado(router) as client:
+        assert client.state
+        start = time.monotonic()
+        assert not client.ping()
+        assert time.monotonic() - start < dovado._TIMEOUT_S
+        assert client.state
+    assert router.connections == 2
+
+
+def test_keepalive(router, monkeypatch):
+    """Connection is pinged while idle, and no longer once closed."""
+    monkeypatch.setattr(dovado, '_KEEPALIVE_S', 0.05)
+    with _dovado(router, keepalive=True) as client:
+        assert client.state
+        time.sleep(0.3)
+        assert router.count('') >= 2
+        assert client.state['sms'] == 'enabled'
+    pings = router.count('')
+    time.sleep(0.2)
+    assert router.count('') == pings
+    assert router.connections == 1
+
+
+def test_async_state(router):
+    """AsyncDovado pipelines info and services like Dovado."""
+    async def _run():
+        async with _dovado(router, cls=dovado.AsyncDovado) as client:
+            state = await client.state()
+            info = await client.query('info')
+            return state, info
+    state, info = asyncio.run(_run())
+    assert state['sms'] == 'enabled'
+    assert info['traffic modem tx'] == 12
+    assert router.commands == ['user u', 'pass pw', 'info', 'services',
+                               'info', 'quit']
+
+
+def test_async_reconnect_after_eof(router):
+    """AsyncDovado reopens a dropped connection and retries."""
+    router.hangup_after = 3
+
+    async def _run():
+        async with _dovado(router, cls=dovado.AsyncDovado) as client:
+            for _ in range(3):
+                assert (await client.query('info'))['sms unread'] == 2
+    asyncio.run(_run())
+    assert router.connections == 3
+
+
+def test_async_ping(router):
+    """AsyncDovado ping waits for the router and keeps the cursor in step."""
+    async def _run():
+        async with _dovado(router, cls=dovado.AsyncDovado) as client:
+            assert not await client.ping()
+            assert await client.state()
+            assert await client.ping()
+            assert await client.ping()
+            assert (await client.state())['sms'] == 'enabled'
+    asyncio.run(_run())
+    assert router.count('') == 2
+    assert router.connections == 1
+
+
+def test_async_keepalive(router, monkeypatch):
+    """AsyncDovado pings while idle."""
+    monkeypatch.setattr(dovado, '_KEEPALIVE_S', 0.05)
+
+    async def _run():
+        async with _dovado(router, cls=dovado.AsyncDovado,
+                           keepalive=True) as client:
+            assert await client.state()
+            await asyncio.sleep(0.3)
+            assert router.count('') >= 2
+            assert (await client.state())['sms'] == 'enabled'
+    asyncio.run(_run())
+    assert router.connections == 1
+
+
+def test_async_reused_across_event_loops(router):
+    """Connection of a closed event loop is replaced, not reused."""
+    client = dovado.AsyncDovado('u', 'pw', '127.0.0.1',
+                                router.server_address[1])
+    for _ in range(3):
+        assert asyncio.run(client.query('info'))['product name'] == 'Dovado'
+    asyncio.run(client.close())
+    assert router.connections == 3
+
+
+def test_poll(router):
+    """Poll fetches state of several routers and closes them."""
+    first, second = (_dovado(router, cls=dovado.AsyncDovado)
+                     for _ in range(2))
+    states = dovado.poll(first, second)
+    assert [state['sms'] for state in states] == ['enabled', 'enabled']
+    assert router.connections == 2
+    assert router.count('quit') == 2
+
+
+def test_credentials(tmp_path, monkeypatch):
+    """Credentials are read from file and reread when it changes."""
+    monkeypatch.setenv('HOME', str(tmp_path))
+    path = tmp_path / '.dovado.conf'
+    path.write_text('# comment\nusername: u\npassword: secret: 1\nhost\n')
+    assert dovado._read_credentials() == {'username': 'u',
+                                          'password': 'secret: 1'}
+    path.write_text('username: other\npassword: pw\n')
+    mtime = path.stat().st_mtime + 1
+    os.utime(path, (mtime, mtime))
+    assert dovado._read_credentials()['username'] == 'other'
+
+
+def test_credentials_missing(tmp_path, monkeypatch):
+    """No credentials without a file."""
+    monkeypatch.setenv('HOME', str(tmp_path))
+    monkeypatch.setenv('XDG_CONFIG_HOME', str(tmp_path))
+    assert dovado._read_credentials() == {}
+
+
+@pytest.fixture(name='daemon')
+def fixture_daemon(router, tmp_path):
+    """Run daemon serving the fake router."""
+    path = str(tmp_path / 'dovado.sock')
+    process = subprocess.Popen(  # pylint: disable=consider-using-with
+        [sys.executable, '-c',
+         'import sys, dovado; dovado._serve(dovado.AsyncDovado('
+         '"u", "pw", "127.0.0.1", int(sys.argv[1]), cache_ttl=0), '
+         'sys.argv[2])',
+         str(router.server_address[1]), path],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    for _ in range(100):
+        if os.path.exists(path):
+            break
+        time.sleep(0.05)
+    yield path
+    process.send_signal(signal.SIGTERM)
+    assert process.wait(5) == 0
+    assert not os.path.exists(path)
+
+
+def _request(path, *lines):
+    """Send raw request lines to daemon, returning the responses."""
+    with socket.socket(socket.AF_UNIX) as sock:
+        sock.connect(path)
+        with sock.makefile('rwb') as stream:
+            responses = []
+            for line in lines:
+                stream.write(line + b'\n')
+                stream.flush()
+                responses.append(json.loads(stream.readline()))
+            return responses
+
+
+def test_daemon(daemon, router):
+    """Requests are forwarded through the daemon's connection."""
+    with dovado._DaemonClient.connect(daemon) as client:
+        assert client.state['sms'] == 'enabled'
+        assert client.query('info')['product name'] == 'Dovado'
+        assert client.query('info', False).startswith('PRODUCT_NAME')
+    with dovado._DaemonClient.connect(daemon) as client:
+        assert client.state['sms'] == 'enabled'
+    assert router.connections == 1
+
+
+def test_daemon_invalid_requests(daemon):
+    """Malformed requests are answered, keeping the connection usable."""
+    responses = _request(
+        daemon,
+        b'garbage',
+        b'{"method": "nope", "args": []}',
+        b'{"method": "query", "args": []}',
+        b'["query"]',
+        b'{"method": "query", "args": ["info"]}')
+    for response in responses[:-1]:
+        assert response['error'].startswith('Invalid request')
+    assert responses[-1]['result']['product name'] == 'Dovado'
+
+
+def test_daemon_router_errors(daemon, router):
+    """Errors from the router are not reported as invalid requests."""
+    router.hangup_after = 1
+    with dovado._DaemonClient.connect(daemon) as client:
+        with pytest.raises(RuntimeError) as error:
+            assert client.state
+    assert not str(error.value).startswith('Invalid request')
+    assert router.connections == 2
+
+
+def test_daemon_missing(tmp_path):
+    """No client without a daemon."""
+    assert dovado._DaemonClient.connect(str(tmp_path / 'none')) is None